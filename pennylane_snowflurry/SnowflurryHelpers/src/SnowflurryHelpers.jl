@@ -0,0 +1,120 @@
+# Helper functions called by the plugin, loaded by pennylane_converter.py with
+# `using Snowflurry, SnowflurryHelpers`.
+# They live in a package of their own, installed in the Julia environment of the plugin by julia_setup.py,
+# so that the methods compiled into a system image by sysimage/build_sysimage.jl are the ones used at runtime.
+module SnowflurryHelpers
+
+using Snowflurry
+
+export copy_circuit,
+    without_readouts,
+    count_shots,
+    push_readouts!,
+    with_readouts,
+    run_jobs,
+    fill_samples!,
+    expected_values
+
+"""
+    copy_circuit(circuit)
+
+Return a copy of `circuit` whose instructions can be modified without altering the original.
+Instructions are immutable, so only the instruction vector needs to be copied.
+"""
+function copy_circuit(circuit::QuantumCircuit)
+    return QuantumCircuit(
+        qubit_count=circuit.qubit_count,
+        bit_count=circuit.bit_count,
+        instructions=copy(circuit.instructions),
+    )
+end
+
+"""
+    without_readouts(circuit)
+
+Return a copy of `circuit` from which every readout has been filtered out.
+"""
+function without_readouts(circuit::QuantumCircuit)
+    return QuantumCircuit(
+        qubit_count=circuit.qubit_count,
+        bit_count=circuit.bit_count,
+        instructions=filter(i -> !(i isa Readout), circuit.instructions),
+    )
+end
+
+"""
+    count_shots(shots)
+
+Return the sorted distinct outcomes of `shots` and the number of times each one occurred,
+as a tuple of two vectors.
+"""
+function count_shots(shots::AbstractVector)
+    counts = Dict{eltype(shots),Int}()
+    for shot in shots
+        counts[shot] = get(counts, shot, 0) + 1
+    end
+    outcomes = sort!(collect(keys(counts)))
+    return (outcomes, [counts[outcome] for outcome in outcomes])
+end
+
+"""
+    push_readouts!(circuit, qubits)
+
+Apply a readout on each of the given qubits of `circuit`, each qubit being read into the bit with the
+same index.
+"""
+function push_readouts!(circuit::QuantumCircuit, qubits)
+    for qubit in qubits
+        push!(circuit, readout(qubit, qubit))
+    end
+    return circuit
+end
+
+"""
+    with_readouts(circuit, qubits)
+
+Return a copy of `circuit` with a readout applied on each of the given qubits.
+"""
+with_readouts(circuit::QuantumCircuit, qubits) = push_readouts!(copy_circuit(circuit), qubits)
+
+"""
+    run_jobs(qpu, circuits, shots_count)
+
+Run every circuit on `qpu` and return their histograms, in the same order as `circuits`.
+Each job is submitted and polled in its own task, so the time spent waiting on the server overlaps.
+"""
+function run_jobs(qpu, circuits, shots_count::Integer)
+    tasks = [
+        @async first(transpile_and_run_job(qpu, circuit, shots_count)) for circuit in circuits
+    ]
+    return fetch.(tasks)
+end
+
+"""
+    fill_samples!(samples, circuit)
+
+Simulate `length(samples)` shots of `circuit` and write each outcome in `samples` as an integer,
+the first bit of the outcome being the most significant one.
+"""
+function fill_samples!(samples::AbstractVector{UInt64}, circuit::QuantumCircuit)
+    for (index, shot) in enumerate(simulate_shots(circuit, length(samples)))
+        samples[index] = parse(UInt64, shot; base=2)
+    end
+    return samples
+end
+
+"""
+    expected_values(operators, state)
+
+Return the expected value of each operator for `state`. The operators are distributed over the Julia
+threads, whose number is set with the PYTHON_JULIACALL_THREADS environment variable.
+"""
+function expected_values(operators::AbstractVector, state::Ket)
+    values = Vector{ComplexF64}(undef, length(operators))
+    Threads.@threads for index in eachindex(operators)
+        values[index] = expected_value(operators[index], state)
+    end
+    return values
+end
+
+end # module
@@ -8,6 +8,13 @@ REQUIRED_PACKAGES = [
     PkgSpec(
         name="Snowflurry", uuid="7bd9edc1-4fdc-40a1-a0f6-da58fb4f45ec", version="0.4"
     ),
+    # Julia helpers of the plugin, shipped with it and installed from its directory
+    PkgSpec(
+        name="SnowflurryHelpers",
+        uuid="0892a716-5cca-4c03-aac4-82b6f435430c",
+        dev=True,
+        path=os.path.join(os.path.dirname(__file__), "SnowflurryHelpers"),
+    ),
 ]
 
 IS_USER_CONFIGURED = False
@@ -84,7 +91,10 @@ class JuliaEnv:
         try:
             for package_name, package_info in self.json_pkg_list.items():
                 if str(package_name) == required_pkg.name:
-                    if package_info.get("version", []) == required_pkg.version:
+                    # packages installed from a local directory have a path and no version
+                    if (package_info.get("version") or None) == (
+                        required_pkg.version or None
+                    ) and package_info.get("path") == getattr(required_pkg, "path", None):
                         return True
                     return False
         except:
@@ -106,7 +116,15 @@ class JuliaEnv:
         """
 
         for required_pkg in self.required_packages:
-            self.json_pkg_list[required_pkg.name] = {
-                "uuid": required_pkg.uuid,
-                "version": required_pkg.version,
-            }
+            if getattr(required_pkg, "path", None) is not None:
+                # packages installed from a local directory, like the plugin's Julia helpers
+                self.json_pkg_list[required_pkg.name] = {
+                    "uuid": required_pkg.uuid,
+                    "path": required_pkg.path,
+                    "dev": required_pkg.dev,
+                }
+            else:
+                self.json_pkg_list[required_pkg.name] = {
+                    "uuid": required_pkg.uuid,
+                    "version": required_pkg.version,
+                }
@@ -1,4 +1,4 @@
-from .measurement_strategy import MeasurementStrategy
+from .measurement_strategy import MeasurementStrategy, ReadoutStrategy
 from .counts import Counts
 from .sample import Sample
 from .probabilities import Probabilities
@@ -1,26 +1,22 @@
-from .measurement_strategy import MeasurementStrategy
+from .measurement_strategy import ReadoutStrategy
 from collections import Counter
 
 
-class Counts(MeasurementStrategy):
+class Counts(ReadoutStrategy):
 
     def __init__(self):
         super().__init__()
 
     def measure(self, converter, mp, shots):
-        if self.Snowflurry.currentClient is None:
+        if converter.snowflurry_client is None:
             converter.remove_readouts()
-            converter.apply_readouts(mp.obs)
-            shots_results = self.Snowflurry.simulate_shots(self.Snowflurry.sf_circuit, shots)
-            result = dict(Counter(shots_results))
-            return result
+            converter.apply_readouts(self.readout_wires(converter, mp))
+            shots_results = self.Snowflurry.simulate_shots(converter.snowflurry_py_circuit, shots)
+            # The histogram is computed in Julia, so only the distinct outcomes cross over to Python
+            outcomes, counts = self.Snowflurry.count_shots(shots_results)
+            return dict(zip(outcomes, counts))
         else:  # if we have a client, we use the real machine
-            converter.apply_readouts(mp.obs)
-            qpu = self.Snowflurry.AnyonYamaskaQPU(
-                self.Snowflurry.currentClient, self.Snowflurry.seval("project_id")
-            )
-            shots_results, time = self.Snowflurry.transpile_and_run_job(
-                qpu, self.Snowflurry.sf_circuit, shots
-            )
+            converter.apply_readouts(self.readout_wires(converter, mp))
+            shots_results = converter.run_on_hardware(shots)
             result = dict(Counter(shots_results))
-            return result
+            return result
\ No newline at end of file
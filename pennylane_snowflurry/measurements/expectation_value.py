@@ -1,11 +1,65 @@
 from .measurement_strategy import MeasurementStrategy
 import pennylane as qml
 from juliacall import convert
+from collections import OrderedDict
 import numpy as np
 
 
+def is_diagonal_z(obs):
+    """
+    Check if an observable is made only of Pauli Z and identity factors, and is thus diagonal in the
+    computational basis.
+
+    Args:
+        obs (Observable): The observable.
+
+    Returns:
+        bool: True if the observable only has Pauli Z and identity factors, False otherwise.
+    """
+    pauli_rep = getattr(obs, "pauli_rep", None)
+    if pauli_rep is None:
+        return False
+    return all(pauli == "Z" for word in pauli_rep for pauli in word.values())
+
+
+def diagonal_z_values(obs, wires_nb):
+    """
+    Return the diagonal of an observable made only of Pauli Z and identity factors, such as PauliZ,
+    a product of PauliZ or a Hamiltonian of such products, in the computational basis of all the wires.
+
+    Args:
+        obs (Observable): The observable.
+        wires_nb (int): The number of wires of the circuit.
+
+    Returns:
+        Optional[np.ndarray]: The 2**wires_nb diagonal elements, or None if the observable is not
+            diagonal in the computational basis.
+    """
+    if not is_diagonal_z(obs):
+        return None
+
+    pauli_rep = obs.pauli_rep
+    indices = np.arange(2**wires_nb)
+    diagonal = np.zeros(2**wires_nb)
+    for word, coefficient in pauli_rep.items():
+        term = np.full(2**wires_nb, np.real(coefficient), dtype=float)
+        for wire in word:
+            # wire 0 is the most significant bit, a Z factor is -1 where its bit is 1
+            term *= 1 - 2 * ((indices >> (wires_nb - 1 - wire)) & 1)
+        diagonal += term
+    return diagonal
+
+
 class ExpectationValue(MeasurementStrategy):
 
+    # DenseOperator of the observables measured recently, keyed by Operator.hash, which accounts for
+    # the type, wires and coefficients of the observable. The matrix of an observable that is measured
+    # repeatedly, as in variational workloads, is then only built and copied to Julia once.
+    # Each entry also holds the size of its matrix in bytes. The least recently used entries are evicted
+    # when the total exceeds operator_cache_bytes, and a matrix larger than that is never cached.
+    operator_cache_bytes = 256 * 2**20
+    _operator_cache = OrderedDict()
+
     def __init__(self):
         super().__init__()
 
@@ -14,13 +68,79 @@ class ExpectationValue(MeasurementStrategy):
         #  in the circuit
         # Requires some processing to work with larger matrices
         converter.remove_readouts()
-        self.Snowflurry.result_state = self.Snowflurry.simulate(self.Snowflurry.sf_circuit)
+        if mp.obs is not None:
+            # A diagonal observable only needs the probabilities of the basis states, so the dense
+            # matrix is never built
+            diagonal = diagonal_z_values(mp.obs, converter.wires)
+            if diagonal is not None:
+                probabilities = np.abs(converter.get_final_state_vector()) ** 2
+                return probabilities @ diagonal
         if mp.obs is not None and mp.obs.has_matrix:
-            print(mp.obs)
-            observable_matrix = qml.matrix(mp.obs)
-            print(observable_matrix)
-            expected_value = self.Snowflurry.expected_value(
-                self.Snowflurry.DenseOperator(convert(self.Snowflurry.Matrix, observable_matrix)),
-                self.Snowflurry.result_state
-            )
+            expected_value = converter.expectation_values.get(mp.obs.hash)
+            if expected_value is None:
+                expected_value = self.Snowflurry.expected_value(
+                    self.get_operator(mp.obs),
+                    converter.get_final_state()
+                )
             return np.real(expected_value)
+
+    def prepare(self, converter, measurements):
+        """
+        Compute at once the expectation values of the non-diagonal observables of a circuit.
+
+        The expectation values are computed by a single Julia call that distributes them over the
+        Julia threads, and are stored in converter.expectation_values, keyed by Operator.hash, for
+        measure to use.
+
+        Args:
+            converter (PennylaneConverter): The converter of the circuit.
+            measurements (List[MeasurementProcess]): The measurement processes of the circuit.
+        """
+        observables = {}
+        for mp in measurements:
+            if (
+                isinstance(mp, qml.measurements.ExpectationMP)
+                and mp.obs is not None
+                and mp.obs.has_matrix
+                and not is_diagonal_z(mp.obs)
+            ):
+                observables.setdefault(mp.obs.hash, mp.obs)
+
+        if len(observables) < 2:
+            # a single expectation value gains nothing from being batched
+            return
+
+        operators = [self.get_operator(obs) for obs in observables.values()]
+        expected_values = self.Snowflurry.expected_values(
+            convert(self.Snowflurry.Vector, operators), converter.get_final_state()
+        )
+        converter.expectation_values.update(zip(observables, expected_values))
+
+    def get_operator(self, obs):
+        """
+        Return the Snowflurry DenseOperator of an observable, from the cache when possible.
+
+        Args:
+            obs (Observable): The observable, which must have a matrix.
+
+        Returns:
+            DenseOperator: The Julia operator of the observable.
+        """
+        key = obs.hash
+        cached = self._operator_cache.get(key)
+        if cached is not None:
+            self._operator_cache.move_to_end(key)
+            return cached[0]
+
+        observable_matrix = qml.matrix(obs)
+        operator = self.Snowflurry.DenseOperator(convert(self.Snowflurry.Matrix, observable_matrix))
+        size = observable_matrix.nbytes
+        if size > self.operator_cache_bytes:
+            return operator
+
+        self._operator_cache[key] = (operator, size)
+        cached_bytes = sum(size for _, size in self._operator_cache.values())
+        while cached_bytes > self.operator_cache_bytes:
+            _, (_, evicted_size) = self._operator_cache.popitem(last=False)
+            cached_bytes -= evicted_size
+        return operator
@@ -0,0 +1,66 @@
+"""
+Kernels used to post-process state vectors in Python.
+
+They are compiled with Numba when it is installed (``pip install pennylane-snowflurry[numba]``),
+and fall back to NumPy otherwise.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange, get_num_threads
+except ImportError:
+    njit = None
+
+
+def marginal_probabilities(state, wires, wires_nb):
+    """
+    Compute the probabilities of the basis states of a subset of the wires, from a state vector.
+
+    Args:
+        state (np.ndarray): The state vector, of length 2**wires_nb, wire 0 being the most significant bit.
+        wires (Sequence[int]): The wires to keep, in the order of the bits of the returned basis states.
+        wires_nb (int): The number of wires of the state.
+
+    Returns:
+        np.ndarray: The 2**len(wires) marginal probabilities.
+    """
+    wires = np.asarray(wires, dtype=np.int64)
+    summed_nb = wires_nb - wires.size
+    # when almost no wire is summed over, the marginal is mostly a reordering of the probabilities,
+    # which NumPy does well without the histogram of each block of the kernel
+    if njit is not None and summed_nb >= 2:
+        # each block fills a histogram of 2**len(wires) probabilities, so there are at most 2**summed_nb
+        # blocks for the histograms to take no more memory than the state
+        blocks_nb = min(get_num_threads(), 1 << summed_nb)
+        return _marginalize_probs(np.ascontiguousarray(state), wires, wires_nb, blocks_nb)
+
+    probabilities = (np.abs(state) ** 2).reshape([2] * wires_nb)
+    summed_wires = tuple(wire for wire in range(wires_nb) if wire not in wires)
+    marginal = probabilities.sum(axis=summed_wires)
+    # the remaining axes are the kept wires in increasing order
+    sorted_wires = sorted(wires.tolist())
+    return marginal.transpose([sorted_wires.index(wire) for wire in wires]).ravel()
+
+
+if njit is not None:
+
+    @njit(cache=True, parallel=True)
+    def _marginalize_probs(state, kept_wires, wires_nb, blocks_nb):
+        kept_nb = kept_wires.size
+        # bit position, from the least significant bit, of each kept wire in the index of an amplitude
+        shifts = wires_nb - 1 - kept_wires
+
+        # the amplitudes are split in contiguous blocks, at most one per thread, each accumulating its
+        # own histogram so that there is no race, and the histograms are summed at the end
+        block_size = (state.size + blocks_nb - 1) // blocks_nb
+        partial_probabilities = np.zeros((blocks_nb, 1 << kept_nb))
+        for block in prange(blocks_nb):
+            for index in range(block * block_size, min((block + 1) * block_size, state.size)):
+                outcome = 0
+                for j in range(kept_nb):
+                    outcome = (outcome << 1) | ((index >> shifts[j]) & 1)
+                amplitude = state[index]
+                partial_probabilities[block, outcome] += (
+                    amplitude.real * amplitude.real + amplitude.imag * amplitude.imag
+                )
+        return partial_probabilities.sum(axis=0)
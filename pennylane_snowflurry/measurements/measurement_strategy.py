@@ -9,3 +9,42 @@ class MeasurementStrategy:
 
     def measure(self, converter, mp, shots):
         pass
+
+    def prepare(self, converter, measurements):
+        """
+        Do, before any measurement, the work the strategy can share between the measurement processes of a
+        circuit. Called once per circuit for each strategy it uses. Does nothing by default.
+
+        Args:
+            converter (PennylaneConverter): The converter of the circuit.
+            measurements (List[MeasurementProcess]): The measurement processes of the circuit.
+        """
+        pass
+
+    def readout_wires(self, converter, mp):
+        """
+        Get the wires on which the strategy applies a readout before measuring on the QPU.
+
+        The converter uses them to submit the jobs of every measurement of a circuit ahead of time.
+
+        Args:
+            converter (PennylaneConverter): The converter of the circuit.
+            mp (MeasurementProcess): The measurement process.
+
+        Returns:
+            Optional[Iterable[int]]: The 0-indexed wires, which are added to the readouts already in the
+                circuit, or None if the strategy removes the readouts before measuring.
+        """
+        return None
+
+
+class ReadoutStrategy(MeasurementStrategy):
+    """
+    Base class of the strategies that read the circuit with readouts, like counts and samples.
+    """
+
+    def readout_wires(self, converter, mp):
+        # an observable is read on all its wires, otherwise all the wires are read
+        if mp.obs is None:
+            return range(converter.wires)
+        return mp.obs.wires.tolist()
@@ -1,5 +1,6 @@
 from .measurement_strategy import MeasurementStrategy
-from juliacall import convert
+from .kernels import marginal_probabilities
+import numpy as np
 
 
 class Probabilities(MeasurementStrategy):
@@ -10,10 +11,16 @@ class Probabilities(MeasurementStrategy):
     def measure(self, converter, mp, shots):
         converter.remove_readouts()
         wires_list = mp.wires.tolist()
-        if len(wires_list) == 0:
-            return self.Snowflurry.get_measurement_probabilities(self.Snowflurry.sf_circuit)
+        # The probabilities are computed in Python from the cached state vector rather than by
+        # simulating the circuit again in Julia
+        all_wires = list(range(converter.wires))
+        if len(wires_list) == 0 or wires_list == all_wires:
+            return np.abs(converter.get_final_state_vector()) ** 2
+        elif sorted(wires_list) == all_wires:
+            # every wire is kept, so the probabilities only need to be reordered
+            probabilities = np.abs(converter.get_final_state_vector()) ** 2
+            return probabilities.reshape([2] * converter.wires).transpose(wires_list).ravel()
         else:
-            return self.Snowflurry.get_measurement_probabilities(
-                self.Snowflurry.sf_circuit,
-                convert(self.Snowflurry.Vector, [i + 1 for i in wires_list])
+            return marginal_probabilities(
+                converter.get_final_state_vector(), wires_list, converter.wires
             )
\ No newline at end of file
@@ -1,27 +1,56 @@
-from .measurement_strategy import MeasurementStrategy
+from .measurement_strategy import ReadoutStrategy
 import numpy as np
 
 
-class Sample(MeasurementStrategy):
+class Sample(ReadoutStrategy):
 
     def __init__(self):
         super().__init__()
 
     def measure(self, converter, mp, shots):
-        if self.Snowflurry.currentClient is None:
+        if mp.obs is not None and len(mp.obs.diagonalizing_gates()) > 0:
+            # the circuit is read in the computational basis, in which this observable is not diagonal
+            raise ValueError(
+                f"Sampling {mp.obs} is not supported by this device, only observables that are "
+                "diagonal in the computational basis can be sampled."
+            )
+        if converter.snowflurry_client is None:
             converter.remove_readouts()
-            converter.apply_readouts(mp.obs)
-            shots_results = self.Snowflurry.simulate_shots(self.Snowflurry.sf_circuit, shots)
-            return np.asarray(shots_results).astype(int)
+            converter.apply_readouts(self.readout_wires(converter, mp))
+            # Julia writes each shot, encoded as an integer, directly in the NumPy buffer
+            samples = np.empty(shots, dtype=np.uint64)
+            self.Snowflurry.fill_samples_b(samples, converter.snowflurry_py_circuit)
         else:
-            converter.apply_readouts(mp.obs)
-            qpu = self.Snowflurry.AnyonYamaskaQPU(
-                self.Snowflurry.currentClient, self.Snowflurry.seval("project_id")
-            )
-            shots_results, time = self.Snowflurry.transpile_and_run_job(
-                qpu, self.Snowflurry.sf_circuit, shots,
+            converter.apply_readouts(self.readout_wires(converter, mp))
+            shots_results = converter.run_on_hardware(shots)
+            # The bitstrings of the histogram are encoded the same way as the simulated shots
+            samples = np.repeat(
+                np.array([int(key, 2) for key in shots_results.keys()], dtype=np.uint64),
+                list(shots_results.values()),
             )
-            return np.repeat(
-                [int(key) for key in shots_results.keys()],
-                [value for value in shots_results.values()],
-            )
\ No newline at end of file
+        return self.format_samples(converter, mp, samples)
+
+    def format_samples(self, converter, mp, samples):
+        """
+        Unpack the bits of the shots into the samples returned by PennyLane.
+
+        Args:
+            converter (PennylaneConverter): The converter of the circuit.
+            mp (SampleMP): The measurement process.
+            samples (np.ndarray): The shots, each encoded as an integer whose most significant bit is wire 0.
+
+        Returns:
+            np.ndarray: The eigenvalues of the observable for each shot if the measurement process has one,
+                otherwise the bits of the measured wires for each shot, or a flat array for a single wire.
+        """
+        # Unpack the bits of every shot at once, wire 0 being the most significant bit
+        shifts = np.arange(converter.wires - 1, -1, -1, dtype=np.uint64)
+        bits = ((samples[:, np.newaxis] >> shifts) & np.uint64(1)).astype(int)
+        if mp.obs is not None:
+            # the observable is diagonal in the computational basis, so the eigenvalue of a shot is the one
+            # at the index of the basis state read on the wires of the observable
+            obs_wires = mp.obs.wires.tolist()
+            indices = bits[:, obs_wires] @ (1 << np.arange(len(obs_wires) - 1, -1, -1))
+            return np.asarray(mp.obs.eigvals())[indices]
+        wires = mp.wires.tolist() or list(range(converter.wires))
+        return bits[:, wires[0]] if len(wires) == 1 else bits[:, wires]
\ No newline at end of file
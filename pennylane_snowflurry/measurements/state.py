@@ -1,7 +1,5 @@
 from .measurement_strategy import MeasurementStrategy
 
-import numpy as np
-
 
 class State(MeasurementStrategy):
 
@@ -10,7 +8,5 @@ class State(MeasurementStrategy):
 
     def measure(self, converter, mp, shots):
         converter.remove_readouts()
-        self.Snowflurry.result_state = self.Snowflurry.simulate(self.Snowflurry.sf_circuit)
-        # Convert the final state from pyjulia to a NumPy array
-        final_state_np = np.array([element for element in self.Snowflurry.result_state])
-        return final_state_np
+        # Convert the final state from Julia to a NumPy array
+        return converter.get_final_state_vector()
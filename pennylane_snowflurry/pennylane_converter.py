@@ -1,4 +1,5 @@
-from juliacall import newmodule
+from juliacall import newmodule, convert
+import numpy as np
 import pennylane as qml
 from pennylane.tape import QuantumTape
 from pennylane.typing import Result
@@ -13,7 +14,8 @@ from pennylane.measurements import (
     StateMP,
 )
 import time
-import re
+import warnings
+from collections import OrderedDict
 from pennylane.typing import TensorLike
 from typing import Callable, Type
 from pennylane.ops import Sum, Hamiltonian
@@ -59,6 +61,13 @@ SNOWFLURRY_OPERATION_MAP = {
     "Rot": "rotation({3},{0},{1})",  # theta, phi but no omega so we skip {2}, {3} is the wire
 }
 
+# Bound format method of each implemented template, looked up once per operation when converting
+SNOWFLURRY_GATE_FORMATTERS = {
+    name: template.format
+    for name, template in SNOWFLURRY_OPERATION_MAP.items()
+    if template != NotImplementedError
+}
+
 
 """
 if host, user, access_token are left blank, the code will be ran on the simulator
@@ -69,7 +78,8 @@ if host, user, access_token are filled, the code will be sent to Anyon's API
 # Defining namespace for Snowflurry      #
 ##########################################
 Snowflurry = newmodule("Snowflurry")
-Snowflurry.seval("using Snowflurry")
+# SnowflurryHelpers holds the Julia helpers of the plugin, see SnowflurryHelpers/src/SnowflurryHelpers.jl
+Snowflurry.seval("using Snowflurry, SnowflurryHelpers")
 
 
 class PennylaneConverter:
@@ -83,11 +93,29 @@ class PennylaneConverter:
     ###################################
     # Class attributes used for logic #
     ###################################
-    snowflurry_readout_name = "Readout"
-    snowflurry_gate_object_name = "Gate Object"
-
-    # Pattern is found in PyCall.jlwrap object of Snowflurry.QuantumCircuit.instructions
-    snowflurry_str_search_pattern = r"Gate Object: (.*)\n"
+    # Converted circuits are cached by structure (gate names and wires) so that tapes which only
+    # differ by their parameters, as in variational workloads, are not rebuilt from scratch.
+    # Each entry holds the compiled Julia function that builds the circuit from its parameters,
+    # see compile_circuit_builder. The least recently used entry is evicted when the cache is full.
+    # Evicting an entry only drops its Python handle: Julia never frees compiled methods, so a structure
+    # evicted and seen again is compiled again, and each structure ever seen keeps its method in memory.
+    circuit_cache_size = 64
+    _sf_cache = OrderedDict()
+
+    # Strategy used for each type of measurement process, looked up with type(mp)
+    measurement_strategies = {
+        CountsMP: Counts,
+        SampleMP: Sample,
+        ProbabilityMP: Probabilities,
+        ExpectationMP: ExpectationValue,
+        StateMP: State,
+    }
+    # Strategies of the subclasses of the measurement processes above, resolved by get_strategy
+    _resolved_strategies = {}
+    # Strategies hold no state of their own, so a single instance of each is shared by every converter.
+    # Each instance keeps the Snowflurry namespace it was created with (see MeasurementStrategy), so a
+    # test that mocks the namespace must also replace this dict to avoid sharing instances holding the mock
+    _strategy_instances = {}
 
     #################
     # Class methods #
@@ -103,7 +131,8 @@ class PennylaneConverter:
         access_token="",
         project_id="",
         realm="",
-        wires=None
+        wires=None,
+        device_wires=None,
     ):
 
         # Instance attributes related to PennyLane
@@ -111,36 +140,77 @@ class PennylaneConverter:
         self.debugger = debugger
         self.interface = interface
         self.wires = wires
+        # Labels of the wires of the device, in order, each one mapped to the qubit of the same index
+        self.device_wires = device_wires
 
         # Instance attributes related to Snowflurry
+        # Every Julia object is held by the instance rather than stored in a global of the Snowflurry
+        # namespace, so that several converters can be used at the same time without interfering
         self.snowflurry_py_circuit = None
+        # 0-indexed wires on which a readout is applied in snowflurry_py_circuit, kept up to date
+        # whenever readouts are pushed or removed so the circuit never has to be scanned for them
+        self._readout_wires = set()
+        # Final state of snowflurry_py_circuit, simulated at most once per conversion
+        self._final_state = None
+        self._final_state_np = None
+        # Histograms returned by the QPU, keyed by the frozenset of wires with a readout
+        self._job_results = {}
+        # Expectation values computed ahead of their measurement, keyed by Operator.hash
+        self.expectation_values = {}
         if (
             len(host) != 0
             and len(user) != 0
             and len(access_token) != 0
             and len(realm) != 0
         ):
-            Snowflurry.currentClient = Snowflurry.Client(
+            self.snowflurry_client = Snowflurry.Client(
                 host=host, user=user, access_token=access_token, realm=realm
             )
-            Snowflurry.seval('project_id="' + project_id + '"')
         else:
-            Snowflurry.currentClient = None
+            self.snowflurry_client = None
+        self.project_id = project_id
 
         self.measurementStrategy = None
+        self._standard_circuit = None
 
     def simulate(self):
+        # The tape with standard wires is computed once per simulation and used both to build the
+        # circuit and by the measurements, so that gates and measurements act on the same qubits
+        self._standard_circuit = self.map_to_device_wires()
         self.snowflurry_py_circuit = self.convert_circuit(
-            self.pennylane_circuit
+            self._standard_circuit
         )
         return self.measure_final_state()
 
+    def map_to_device_wires(self):
+        """
+        Map the wires of the pennylane circuit to the indices of the wires of the device.
+
+        The wires keep the order of the device, so that measurements over all the wires, like state or
+        probs without wires, return their results in the order of the device wires.
+
+        Returns:
+            QuantumTape: The circuit whose wires are 0 to self.wires - 1.
+        """
+        if self.device_wires is not None:
+            wire_map = {wire: index for index, wire in enumerate(self.device_wires)}
+            if any(wire != index for wire, index in wire_map.items()):
+                return self.pennylane_circuit.map_wires(wire_map)
+            return self.pennylane_circuit
+        if all(
+            isinstance(wire, int) and 0 <= wire < self.wires
+            for wire in self.pennylane_circuit.wires
+        ):
+            # the wires are already indices of the device wires
+            return self.pennylane_circuit
+        return self.pennylane_circuit.map_to_standard_wires()
+
     def convert_circuit(
         self, pennylane_circuit: QuantumTape,
     ):
         """
         Convert the received pennylane circuit into a snowflurry device in julia.
-        It is then store into Snowflurry.sf_circuit
+        It is then stored into self.snowflurry_py_circuit
 
         Args:
             pennylane_circuit (QuantumTape): The circuit to simulate.
@@ -151,124 +221,115 @@ class PennylaneConverter:
         """
 
         wires_nb = self.wires  # default number of wires in the circuit
-        Snowflurry.sf_circuit = Snowflurry.QuantumCircuit(qubit_count=wires_nb)
+        self._readout_wires.clear()
+        self._final_state = None
+        self._final_state_np = None
+        self._job_results.clear()
+        self.expectation_values.clear()
 
         prep = None
         if len(pennylane_circuit) > 0 and isinstance(
             pennylane_circuit[0], qml.operation.StatePrepBase
         ):
             prep = pennylane_circuit[0]
+        operations = pennylane_circuit.operations[bool(prep):]
 
-        # Add gates to Snowflurry circuit
-        for op in pennylane_circuit.operations[bool(prep):]:
-            if op.name in SNOWFLURRY_OPERATION_MAP:
-                if SNOWFLURRY_OPERATION_MAP[op.name] == NotImplementedError:
-                    print(f"{op.name} is not implemented yet, skipping...")
-                    continue
-                parameters = op.parameters + [i + 1 for i in op.wires.tolist()]
-                gate = SNOWFLURRY_OPERATION_MAP[op.name].format(*parameters)
-                Snowflurry.seval(f"push!(sf_circuit,{gate})")
-            else:
-                print(f"{op.name} is not supported by this device. skipping...")
-
-        return Snowflurry.sf_circuit
-
-    def apply_readouts(self, obs):
-        """
-        Apply readouts to all wires in the snowflurry circuit.
+        tape_key = (wires_nb,) + tuple(
+            (op.name, tuple(op.wires.tolist())) for op in operations
+        )
+        builder = self._sf_cache.get(tape_key)
+        if builder is None:
+            builder = self.compile_circuit_builder(operations)
+            self._sf_cache[tape_key] = builder
+            if len(self._sf_cache) > self.circuit_cache_size:
+                self._sf_cache.popitem(last=False)
+        else:
+            self._sf_cache.move_to_end(tape_key)
+
+        # The parameters are passed as a Float64 array, in the order of the gates of the builder
+        parameters = np.array(
+            [
+                parameter
+                for op in operations
+                if op.name in SNOWFLURRY_GATE_FORMATTERS
+                for parameter in op.parameters
+            ],
+            dtype=np.float64,
+        )
+        self.snowflurry_py_circuit = builder(parameters)
+        return self.snowflurry_py_circuit
 
-        Args:
-            obs (Optional[Observable]): The observable mentioned in the measurement process. If None,
-                readouts are applied to all wires because we assume the user wants to measure all wires.
+    def compile_circuit_builder(self, operations):
         """
+        Compile a Julia function that builds the snowflurry circuit of a sequence of operations.
 
-        if obs is None:  # if no observable is given, we apply readouts to all wires
-            for wire in range(self.wires):
-                Snowflurry.seval(f"push!(sf_circuit, readout({wire + 1}, {wire + 1}))")
-
-        else:
-            # if an observable is given, we apply readouts to the wires mentioned in the observable,
-            # TODO : could add Pauli rotations to get the correct observable
-            self.apply_single_readout(obs.wires[0])
+        The function takes the vector of the parameters of the operations, in order, and returns a new
+        QuantumCircuit. It is parsed and compiled once per circuit structure, then called for every set of
+        parameters without any parsing. The compiled method stays in Julia until the end of the process.
 
-    def get_circuit_as_dictionary(self):
-        """
-        Take the snowflurry QuantumCircuit.instructions and convert it to an array of operations.
-        When instruction is called from Snowflurry, PyCall returns a jlwrap object which is not easily
-        iterable. This function is used to convert the jlwrap object to a Python dictionary.
+        Args:
+            operations (List[Operation]): The operations of the circuit, without state preparation.
 
         Returns:
-            Dict [str, [int]]: A dictionary containing the operations and an array of the wires they are
-                applied to.
+            The compiled Julia function.
 
         Example:
-            >>> Snowflurry.sf_circuit.instructions
-            [<PyCall.jlwrap Gate Object: Snowflurry.Hadamard
-            Connected_qubits        : [1]
-            Operator:
-            (2, 2)-element Snowflurry.DenseOperator:
-            Underlying data ComplexF64:
-            0.7071067811865475 + 0.0im    0.7071067811865475 + 0.0im
-            0.7071067811865475 + 0.0im    -0.7071067811865475 + 0.0im
-            >, <PyCall.jlwrap Gate Object: Snowflurry.ControlX
-            Connected_qubits        : [2, 1]
-            Operator:
-            (4, 4)-element Snowflurry.DenseOperator:
-            Underlying data ComplexF64:
-            1.0 + 0.0im    0.0 + 0.0im    0.0 + 0.0im    0.0 + 0.0im
-            0.0 + 0.0im    1.0 + 0.0im    0.0 + 0.0im    0.0 + 0.0im
-            0.0 + 0.0im    0.0 + 0.0im    0.0 + 0.0im    1.0 + 0.0im
-            0.0 + 0.0im    0.0 + 0.0im    1.0 + 0.0im    0.0 + 0.0im
-            >, <PyCall.jlwrap Explicit Readout object:
-            connected_qubit: 1
-            destination_bit: 1
-            >]
-
-            Becomes:
-            [{'gate': 'Snowflurry.Hadamard', 'connected_qubits': [1]},
-            {'gate': 'Snowflurry.ControlX', 'connected_qubits': [1, 2]},
-            {'gate': 'Readout', 'connected_qubits': [1]}]
+            >>> converter.compile_circuit_builder([qml.Hadamard(0), qml.RX(0.5, 1)])
+            # compiles the following Julia function
+            params -> QuantumCircuit(qubit_count=2,
+                instructions=AbstractInstruction[hadamard(1),rotation_x(2,params[1])])
+        """
+        gates = []
+        parameters_nb = 0
+        skipped_ops = set()
 
+        # Add gates to Snowflurry circuit
+        for op in operations:
+            gate_formatter = SNOWFLURRY_GATE_FORMATTERS.get(op.name)
+            if gate_formatter is None:
+                # warn once per operation name rather than once per skipped gate
+                if op.name not in skipped_ops:
+                    skipped_ops.add(op.name)
+                    if op.name in SNOWFLURRY_OPERATION_MAP:
+                        warnings.warn(f"{op.name} is not implemented yet, skipping...")
+                    else:
+                        warnings.warn(f"{op.name} is not supported by this device. skipping...")
+                continue
+            # parameters are read from the params vector, wires and vectors are 1-indexed in Julia
+            parameters = [
+                f"params[{parameters_nb + i + 1}]" for i in range(len(op.parameters))
+            ]
+            parameters_nb += len(op.parameters)
+            gates.append(
+                gate_formatter(*parameters, *[i + 1 for i in op.wires.tolist()])
+            )
+
+        # The circuit is built by a single function rather than one push! per gate, so that Julia
+        # parses and compiles the program once and the Python-Julia boundary is crossed once.
+        # The gates are collected in a typed vector rather than passed to a variadic push!, which
+        # would be specialized on the tuple of all the gate types and compile slowly for large circuits
+        return Snowflurry.seval(
+            f"params -> QuantumCircuit(qubit_count={self.wires}, "
+            f"instructions=AbstractInstruction[{','.join(gates)}])"
+        )
+
+    def apply_readouts(self, wires):
+        """
+        Apply readouts to the given wires of the snowflurry circuit.
 
+        Args:
+            wires (Iterable[int]): The 0-indexed wires to read, as returned by the readout_wires method of
+                the measurement strategy. Wires that already have a readout are skipped.
         """
-        ops = []
-        instructions = (
-            Snowflurry.sf_circuit.instructions
-        )  # instructions is a jlwrap object
-        gate_str = ""
-        gate_name = ""
-
-        for inst in instructions:
-
-            gate_str = str(inst)  # convert the jlwrap object to a string
-
-            try:
-                if self.snowflurry_gate_object_name in gate_str:
-                    # if the gate is a Gate object, we extract the name and the connected qubits
-                    # from the string with a regex
-                    gate_name = re.search(
-                        self.snowflurry_str_search_pattern, gate_str
-                    ).group(1)
-                    op_data = {
-                        "gate": gate_name,
-                        "connected_qubits": list(inst.connected_qubits),
-                    }
-                if self.snowflurry_readout_name in gate_str:
-                    # if the gate is a Readout object, we extract the connected qubit from the string
-                    gate_name = self.snowflurry_readout_name
-                    op_data = {
-                        "gate": gate_name,
-                        "connected_qubits": [inst.connected_qubit],
-                    }
-                # NOTE : attribute for the Gate object is connected_qubits (plural)
-                # while the attribute for the Readout object is connected_qubit (singular)
-
-            except:
-                raise ValueError(f"Error while parsing {gate_str}")
-
-            ops.append(op_data)
-
-        return ops
+        wires = [wire for wire in wires if wire not in self._readout_wires]
+        if len(wires) == 0:
+            return
+        # the wire number is 1-indexed in Julia
+        Snowflurry.push_readouts_b(
+            self.snowflurry_py_circuit,
+            convert(Snowflurry.Vector, [wire + 1 for wire in wires]),
+        )
+        self._readout_wires.update(wires)
 
     def has_readout(self) -> bool:
         """
@@ -277,41 +338,121 @@ class PennylaneConverter:
         Returns:
             bool: True if a readout is applied, False otherwise.
         """
-        ops = self.get_circuit_as_dictionary()
-        for op in ops:
-            if op["gate"] == self.snowflurry_readout_name:
-                return True
-        return False
+        return bool(self._readout_wires)
 
     def remove_readouts(self):
         """
-        Remove all readouts from the snowflurry circuit with pop!() function.
+        Remove all readouts from the snowflurry circuit.
 
+        The readouts are filtered out of the instructions vector in Julia, and a new QuantumCircuit
+        is constructed with that vector.
         """
-        # RFE : eventually, removing the readouts could be done by making a copy
-        # of the instructions vector and removing the readouts from it before
-        # contructing a new QuantumCircuit with that vector.
-        while self.has_readout():
-            Snowflurry.seval("pop!(sf_circuit)")
+        if not self.has_readout():
+            return
+        self.snowflurry_py_circuit = Snowflurry.without_readouts(
+            self.snowflurry_py_circuit
+        )
+        self._readout_wires.clear()
 
-    def apply_single_readout(self, wire):
+    def get_final_state(self):
         """
-        Apply a readout to a single wire in the snowflurry circuit.
+        Simulate the snowflurry circuit without its readouts and return the final state.
+
+        The simulation is done once and the state is shared by every measurement process that needs
+        it, so a tape with several expectation values or states does not simulate the circuit again.
+
+        Returns:
+            Ket: The final state, as a Snowflurry Ket.
+        """
+        if self._final_state is None:
+            self.remove_readouts()
+            self._final_state = Snowflurry.simulate(self.snowflurry_py_circuit)
+        return self._final_state
+
+    def get_final_state_vector(self):
+        """
+        Return the final state of the snowflurry circuit as a NumPy array.
+
+        The amplitudes are copied from the underlying Julia vector in a single pass through its array
+        interface, rather than being converted to Python one element at a time.
+
+        Returns:
+            np.ndarray: The state vector, of length 2**wires.
+        """
+        if self._final_state_np is None:
+            self._final_state_np = np.array(
+                self.get_final_state().data, dtype=np.complex128
+            )
+        return self._final_state_np
+
+    def get_qpu(self):
+        """
+        Return the Anyon QPU associated with the client and project of the converter.
+        """
+        return Snowflurry.AnyonYamaskaQPU(self.snowflurry_client, self.project_id)
+
+    def run_on_hardware(self, shots):
+        """
+        Run the snowflurry circuit, with its current readouts, on the QPU.
+
+        A job is only submitted if no job was already run for the same readouts, for instance by
+        submit_hardware_jobs.
 
         Args:
-            wire (int): The wire to apply the readout to.
+            shots (int): The number of shots
+
+        Returns:
+            Dict [str, int]: The histogram of the results returned by the QPU.
         """
-        ops = self.get_circuit_as_dictionary()
+        readout_wires = frozenset(self._readout_wires)
+        if readout_wires not in self._job_results:
+            shots_results, _ = Snowflurry.transpile_and_run_job(
+                self.get_qpu(), self.snowflurry_py_circuit, shots
+            )
+            self._job_results[readout_wires] = shots_results
+        return self._job_results[readout_wires]
 
-        for op in ops:
-            # if a readout is already applied to the wire, we don't apply another one
-            if op["gate"] == self.snowflurry_readout_name:
-                if op["connected_qubits"] == wire - 1:  # wire is 1-indexed in Julia
-                    return
+    def submit_hardware_jobs(self, measurements, shots):
+        """
+        Run on the QPU, concurrently, the jobs needed by the counts and samples measurements.
 
-        # if no readout is applied to the wire, we apply one while taking into account that
-        # the wire number is 1-indexed in Julia
-        Snowflurry.seval(f"push!(sf_circuit, readout({wire+1}, {wire+1}))")
+        The readouts each measurement will apply, as reported by the readout_wires method of its
+        strategy, are accumulated in order and one job is run per distinct set of readouts. The jobs
+        are then run in separate Julia tasks, so their waiting times overlap instead of adding up,
+        and measurements sharing the same readouts share the same job.
+
+        Args:
+            measurements (List[MeasurementProcess]): The measurement processes of the circuit
+            shots (int): The number of shots
+        """
+        readout_wires = set(self._readout_wires)
+        pending = []
+        for mp in measurements:
+            wires = self.get_strategy(mp).readout_wires(self, mp)
+            if wires is None:
+                # the strategy removes the readouts before measuring
+                readout_wires.clear()
+                continue
+            readout_wires.update(wires)
+            configuration = frozenset(readout_wires)
+            if configuration not in self._job_results and configuration not in pending:
+                pending.append(configuration)
+
+        if len(pending) < 2:
+            # a single job gains nothing from being submitted ahead of its measurement
+            return
+
+        circuits = [
+            Snowflurry.with_readouts(
+                self.snowflurry_py_circuit,
+                convert(Snowflurry.Vector, [wire + 1 for wire in sorted(configuration)]),
+            )
+            for configuration in pending
+        ]
+        histograms = Snowflurry.run_jobs(
+            self.get_qpu(), convert(Snowflurry.Vector, circuits), shots
+        )
+        self._job_results.update(zip(pending, histograms))
 
     def measure_final_state(self):
         """
@@ -326,11 +467,19 @@ class PennylaneConverter:
         # it can return ShotCopies with .shot_vector
         # the case with ShotCopies is not handled as of now
 
-        circuit = self.pennylane_circuit.map_to_standard_wires()
+        circuit = self._standard_circuit
+        if circuit is None:
+            circuit = self._standard_circuit = self.map_to_device_wires()
         shots = circuit.shots.total_shots
         if shots is None:
             shots = 1
 
+        if self.snowflurry_client is not None:
+            self.submit_hardware_jobs(circuit.measurements, shots)
+        # each strategy used by the circuit is prepared once, in the order of the measurements
+        for strategy in dict.fromkeys(self.get_strategy(mp) for mp in circuit.measurements):
+            strategy.prepare(self, circuit.measurements)
+
         if len(circuit.measurements) == 1:
             results = self.measure(
                 circuit.measurements[0], shots
@@ -341,8 +490,6 @@ class PennylaneConverter:
                 for mp in circuit.measurements
             )
 
-        # Snowflurry.print(Snowflurry.sf_circuit) # uncomment to print the circuit while debugging
-
         return results
 
     def measure(self, mp: MeasurementProcess, shots):
@@ -359,9 +506,9 @@ class PennylaneConverter:
         Currently supported measurements :
             - counts(works with Snowflurry.simulate_shots)
             - sample(works with Snowflurry.simulate_shots)
-            - probs(works with Snowflurry.get_measurement_probabilities)
+            - probs(computed from the final state vector)
             - expval(works with Snowflurry.simulate and Snowflurry.expected_value)
-            - state(works with Snowflurry.simulate and Snowflurry.result_state)
+            - state(works with Snowflurry.simulate and the Ket data of the final state)
 
         """
         self.measurementStrategy = self.get_strategy(mp)
@@ -378,15 +525,37 @@ class PennylaneConverter:
         Returns:
             MeasurementStrategy: The strategy to use for the measurement process
         """
-        if isinstance(mp, CountsMP):
-            return Counts()
-        elif isinstance(mp, SampleMP):
-            return Sample()
-        elif isinstance(mp, ProbabilityMP):
-            return Probabilities()
-        elif isinstance(mp, ExpectationMP):
-            return ExpectationValue()
-        elif isinstance(mp, StateMP):
-            return State()
-        else:
-            raise ValueError(f"Measurement process {mp} is not supported by this device.")
+        mp_type = type(mp)
+        strategy = self.measurement_strategies.get(mp_type)
+        if strategy is None:
+            strategy = self._resolved_strategies.get(mp_type)
+        if strategy is None:
+            # Subclasses of the supported measurement processes, e.g. DensityMatrixMP for StateMP, are
+            # resolved through their MRO once and then remembered in a separate table
+            strategy = next(
+                (
+                    self.measurement_strategies[base]
+                    for base in mp_type.__mro__
+                    if base in self.measurement_strategies
+                ),
+                None,
+            )
+            if strategy is None:
+                raise ValueError(f"Measurement process {mp} is not supported by this device.")
+            self._resolved_strategies[mp_type] = strategy
+        return self.get_strategy_instance(strategy)
+
+    def get_strategy_instance(self, strategy):
+        """
+        Get the shared instance of a strategy class, creating it on first use.
+
+        Args:
+            strategy (Type[MeasurementStrategy]): The strategy class
+
+        Returns:
+            MeasurementStrategy: The instance of the strategy
+        """
+        instance = self._strategy_instances.get(strategy)
+        if instance is None:
+            instance = self._strategy_instances[strategy] = strategy()
+        return instance
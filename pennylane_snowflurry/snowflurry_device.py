@@ -225,6 +225,7 @@ class SnowflurryQubitDevice(qml.devices.Device):
                 project_id=self.project_id,
                 realm=self.realm,
                 wires=self.num_wires,
+                device_wires=self.wires,
             ).simulate()
             for circuit in circuits
         )
@@ -0,0 +1,14 @@
+# Build a Julia system image in which Snowflurry, the helpers of the plugin and PythonCall (the Julia side
+# of juliacall) are precompiled, which removes most of the compilation latency of the first circuit
+# executed in a Python session.
+#
+# Run it with the Julia executable and project managed by juliapkg, with PackageCompiler installed:
+#     julia --project=<juliapkg project> sysimage/build_sysimage.jl
+# then start Python with PYTHON_JULIACALL_SYSIMAGE=sysimage/pennylane_snowflurry.so
+using PackageCompiler
+
+create_sysimage(
+    [:Snowflurry, :SnowflurryHelpers, :PythonCall];
+    sysimage_path=joinpath(@__DIR__, "pennylane_snowflurry.so"),
+    precompile_execution_file=joinpath(@__DIR__, "precompile_snowflurry.jl"),
+)
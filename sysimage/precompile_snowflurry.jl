@@ -0,0 +1,42 @@
+# Precompile workload used by build_sysimage.jl.
+# It exercises every gate of SNOWFLURRY_OPERATION_MAP (see pennylane_converter.py) and the Snowflurry
+# functions called by the measurement strategies, so that they are compiled into the system image.
+using Snowflurry, SnowflurryHelpers
+
+circuit = QuantumCircuit(qubit_count=3)
+push!(
+    circuit,
+    sigma_x(1),
+    sigma_y(1),
+    sigma_z(1),
+    hadamard(1),
+    control_x(1, 2),
+    controlled(sigma_y(2), [1]),
+    control_z(1, 2),
+    swap(1, 2),
+    iswap(1, 2),
+    rotation_x(1, 0.1),
+    rotation_y(1, 0.2),
+    rotation_z(1, 0.3),
+    identity_gate(1),
+    controlled(swap(2, 3), [1]),
+    controlled(rotation_x(2, 0.1), [1]),
+    controlled(rotation_y(2, 0.2), [1]),
+    controlled(rotation_z(2, 0.3), [1]),
+    phase_shift(1, 0.4),
+    controlled(phase_shift(2, 0.4), [1]),
+    toffoli(1, 2, 3),
+    universal(1, 0.1, 0.2, 0.3),
+    pi_8(1),
+    rotation(1, 0.1, 0.2),
+)
+
+state = simulate(circuit)
+expected_value(DenseOperator(rand(ComplexF64, 8, 8)), state)
+expected_values([DenseOperator(rand(ComplexF64, 8, 8))], state)
+
+with_readouts(circuit, [1, 2])
+push_readouts!(circuit, [1, 2, 3])
+count_shots(simulate_shots(circuit, 10))
+fill_samples!(Vector{UInt64}(undef, 10), circuit)
+without_readouts(circuit)
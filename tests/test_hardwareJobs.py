@@ -0,0 +1,73 @@
+import pennylane as qml
+import unittest
+from unittest import mock
+from pennylane.tape import QuantumScript
+from pennylane_snowflurry.pennylane_converter import PennylaneConverter
+
+HISTOGRAMS = [{"0": 6, "1": 4}, {"00": 5, "11": 5}]
+
+
+class TestHardwareJobs(unittest.TestCase):
+
+    def setUp(self):
+        # strategies created while Snowflurry is mocked capture the mock, so they must not be shared
+        # with the other tests
+        self.start_patch(mock.patch.object(PennylaneConverter, "_strategy_instances", {}))
+        self.snowflurry = self.start_patch(
+            mock.patch("pennylane_snowflurry.pennylane_converter.Snowflurry")
+        )
+        self.start_patch(
+            mock.patch(
+                "pennylane_snowflurry.pennylane_converter.convert",
+                side_effect=lambda _, values: list(values),
+            )
+        )
+        self.snowflurry.with_readouts.side_effect = lambda circuit, qubits: tuple(qubits)
+        self.snowflurry.run_jobs.return_value = HISTOGRAMS
+        self.snowflurry.transpile_and_run_job.return_value = (HISTOGRAMS[0], 0)
+
+        # a converter with a client, whose Julia calls are mocked
+        self.converter = PennylaneConverter(QuantumScript([qml.Hadamard(0)]), wires=2)
+        self.converter.snowflurry_client = mock.Mock()
+        self.converter.snowflurry_py_circuit = "circuit"
+        self.start_patch(mock.patch.object(self.converter, "get_qpu", return_value="qpu"))
+
+    def start_patch(self, patcher):
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_jobs_are_deduplicated_in_order(self):
+        measurements = [
+            qml.counts(qml.PauliZ(0)),
+            qml.sample(qml.PauliZ(1)),
+            qml.counts(qml.PauliZ(1)),  # same readouts as the sample
+            qml.probs(wires=[0]),  # removes the readouts
+            qml.counts(qml.PauliZ(0)),  # same readouts as the first counts
+        ]
+        self.converter.submit_hardware_jobs(measurements, 10)
+
+        self.snowflurry.run_jobs.assert_called_once_with("qpu", [(1,), (1, 2)], 10)
+        self.assertEqual(
+            self.converter._job_results,
+            {frozenset({0}): HISTOGRAMS[0], frozenset({0, 1}): HISTOGRAMS[1]},
+        )
+
+        # the measurements then use the submitted jobs
+        self.converter.apply_readouts([0])
+        self.assertEqual(self.converter.run_on_hardware(10), HISTOGRAMS[0])
+        self.converter.apply_readouts([1])
+        self.assertEqual(self.converter.run_on_hardware(10), HISTOGRAMS[1])
+        self.snowflurry.transpile_and_run_job.assert_not_called()
+
+    def test_single_job_runs_with_its_measurement(self):
+        self.converter.submit_hardware_jobs([qml.counts(qml.PauliZ(0))], 10)
+        self.snowflurry.run_jobs.assert_not_called()
+
+        self.converter.apply_readouts([0])
+        self.assertEqual(self.converter.run_on_hardware(10), HISTOGRAMS[0])
+        self.assertEqual(self.converter.run_on_hardware(10), HISTOGRAMS[0])
+        self.snowflurry.transpile_and_run_job.assert_called_once_with("qpu", "circuit", 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import itertools
+import unittest
+from unittest import mock
+
+import numpy as np
+from pennylane_snowflurry.measurements import kernels
+
+
+def brute_force_marginal(state, wires, wires_nb):
+    """Accumulate the probability of each basis state into the outcome of the kept wires."""
+    probabilities = np.zeros(2 ** len(wires))
+    for index, amplitude in enumerate(state):
+        bits = format(index, f"0{wires_nb}b")
+        outcome = int("".join(bits[wire] for wire in wires), 2)
+        probabilities[outcome] += abs(amplitude) ** 2
+    return probabilities
+
+
+class TestMarginalProbabilities(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.wires_nb = 5
+        state = rng.normal(size=2**self.wires_nb) + 1j * rng.normal(size=2**self.wires_nb)
+        self.state = state / np.linalg.norm(state)
+
+    def check_all_subsets(self):
+        for kept_nb in range(1, self.wires_nb + 1):
+            for wires in itertools.permutations(range(self.wires_nb), kept_nb):
+                self.assertTrue(
+                    np.allclose(
+                        kernels.marginal_probabilities(self.state, list(wires), self.wires_nb),
+                        brute_force_marginal(self.state, wires, self.wires_nb),
+                    ),
+                    f"Marginal probabilities error for wires {wires}",
+                )
+
+    def test_numpy(self):
+        with mock.patch.object(kernels, "njit", None):
+            self.check_all_subsets()
+
+    @unittest.skipIf(kernels.njit is None, "Numba is not installed")
+    def test_numba(self):
+        self.check_all_subsets()
+
+
+if __name__ == "__main__":
+    unittest.main()
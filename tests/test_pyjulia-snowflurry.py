@@ -2,11 +2,7 @@ import pennylane as qml
 import unittest
 from pennylane import numpy as np
 from pennylane.tape import QuantumScript
-from juliacall import newmodule
-
-# TODO : this namespace should be imported from the plugin
-Snowflurry = newmodule("Snowflurry")
-Snowflurry.seval("using Snowflurry")
+from pennylane_snowflurry.pennylane_converter import Snowflurry
 
 
 class TestMeasurements(unittest.TestCase):
@@ -127,7 +123,7 @@ class TestMeasurements(unittest.TestCase):
 class TestPyJulia(unittest.TestCase):
     def test_basic_julia(self):
         print("Testing basic Julia integration")
-        c = Snowflurry.QuantumCircuit(qubit_count=3)  # TODO : import Snowflurry
+        c = Snowflurry.QuantumCircuit(qubit_count=3)
         dev_def = qml.device("snowflurry.qubit", wires=3)
         self.assertEqual(True, True)  # TODO : complete this test
 
@@ -196,6 +192,153 @@ class TestNativeOperations(unittest.TestCase):
         self.assertEqual(snowflurry_circuit(), pennylane_circuit())
 
 
+class TestExpectationValues(unittest.TestCase):
+
+    def setUp(self):
+        self.dev_snowflurry = qml.device("snowflurry.qubit", wires=3)
+        self.dev_pennylane = qml.device("default.qubit", wires=3)
+
+    def test_diagonal_observables(self):
+        print("Testing expectation values of diagonal observables")
+        ops = [qml.Hadamard(0), qml.RY(0.3, 1), qml.CNOT([0, 2])]
+        observables = [
+            qml.PauliZ(1),
+            qml.PauliZ(0) @ qml.PauliZ(2),
+            qml.Hamiltonian(
+                [0.5, -1.2], [qml.PauliZ(0), qml.PauliZ(1) @ qml.PauliZ(2)]
+            ),
+        ]
+
+        for obs in observables:
+            tape = QuantumScript(ops, [qml.expval(obs)])
+            self.assertTrue(
+                np.allclose(
+                    self.dev_pennylane.execute(tape), self.dev_snowflurry.execute(tape)
+                ),
+                f"Expectation value error for {obs}",
+            )
+
+    def test_several_observables(self):
+        print("Testing expectation values of several non-diagonal observables")
+        ops = [qml.RY(0.3, 0), qml.RX(0.5, 0)]
+        # the expectation values of the non-diagonal observables are computed together in Julia
+        tape = QuantumScript(ops, [qml.expval(qml.PauliX(0)), qml.expval(qml.PauliY(0))])
+        self.assertTrue(
+            np.allclose(self.dev_pennylane.execute(tape), self.dev_snowflurry.execute(tape))
+        )
+
+
+class TestSamples(unittest.TestCase):
+
+    def setUp(self):
+        self.dev_snowflurry = qml.device("snowflurry.qubit", wires=2)
+        self.dev_pennylane = qml.device("default.qubit", wires=2)
+
+    def test_sample_shapes_and_values(self):
+        print("Testing the shape and values of samples")
+        # the outcome of this circuit is always 10, so the samples of both devices are equal
+        ops = [qml.PauliX(0)]
+
+        for measurement in (
+            qml.sample(),
+            qml.sample(wires=[1]),
+            qml.sample(wires=[1, 0]),
+            qml.sample(qml.PauliZ(0)),
+            qml.sample(qml.PauliZ(0) @ qml.PauliZ(1)),
+        ):
+            tape = QuantumScript(ops, [measurement], shots=10)
+            expected = np.asarray(self.dev_pennylane.execute(tape))
+            result = np.asarray(self.dev_snowflurry.execute(tape))
+            self.assertEqual(expected.shape, result.shape, f"Shape error for {measurement}")
+            self.assertTrue(np.allclose(expected, result), f"Sample error for {measurement}")
+
+    def test_sample_non_diagonal_observable(self):
+        print("Testing that non-diagonal observables cannot be sampled")
+        for obs in (qml.PauliX(0), qml.Hadamard(0)):
+            tape = QuantumScript([qml.PauliX(0)], [qml.sample(obs)], shots=10)
+            with self.assertRaises(ValueError):
+                self.dev_snowflurry.execute(tape)
+
+
+class TestCircuitCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dev_snowflurry = qml.device("snowflurry.qubit", wires=2)
+        self.dev_pennylane = qml.device("default.qubit", wires=2)
+
+    def test_same_structure_with_new_parameters(self):
+        print("Testing a cached circuit structure with new parameters")
+        # the second circuit has the structure of the first one, so its builder is reused
+        for angle in (0.1, 0.7):
+            ops = [qml.RX(angle, 0), qml.CNOT([0, 1]), qml.RY(2 * angle, 1)]
+            tape = QuantumScript(ops, [qml.expval(qml.PauliZ(1)), qml.probs(wires=[0, 1])])
+            for expected, result in zip(
+                self.dev_pennylane.execute(tape), self.dev_snowflurry.execute(tape)
+            ):
+                self.assertTrue(
+                    np.allclose(expected, result), f"Cached circuit error for angle {angle}"
+                )
+
+
+class TestWireMapping(unittest.TestCase):
+
+    def setUp(self):
+        self.dev_snowflurry = qml.device("snowflurry.qubit", wires=2)
+        self.dev_pennylane = qml.device("default.qubit", wires=2)
+
+    def test_gate_on_second_wire(self):
+        print("Testing a circuit whose gates only act on the second wire")
+        ops = [qml.Hadamard(1)]
+
+        for measurement in (
+            qml.expval(qml.PauliZ(1)),
+            qml.probs(wires=[1]),
+            qml.probs(),
+            qml.state(),
+        ):
+            tape = QuantumScript(ops, [measurement])
+            self.assertTrue(
+                np.allclose(
+                    self.dev_pennylane.execute(tape), self.dev_snowflurry.execute(tape)
+                ),
+                f"Wire mapping error for {measurement}",
+            )
+
+
+    def test_labelled_wires(self):
+        print("Testing a device whose wires are labels")
+        dev_snowflurry = qml.device("snowflurry.qubit", wires=["a", "b"])
+        dev_pennylane = qml.device("default.qubit", wires=["a", "b"])
+        ops = [qml.Hadamard("b")]
+
+        for measurement in (qml.expval(qml.PauliZ("b")), qml.probs(), qml.state()):
+            tape = QuantumScript(ops, [measurement])
+            self.assertTrue(
+                np.allclose(dev_pennylane.execute(tape), dev_snowflurry.execute(tape)),
+                f"Wire mapping error for {measurement}",
+            )
+
+
+class TestProbabilities(unittest.TestCase):
+
+    def setUp(self):
+        self.dev_snowflurry = qml.device("snowflurry.qubit", wires=3)
+        self.dev_pennylane = qml.device("default.qubit", wires=3)
+
+    def test_marginal_probabilities(self):
+        print("Testing probabilities of a subset of the wires")
+        ops = [qml.Hadamard(0), qml.RY(0.3, 1), qml.CNOT([0, 2])]
+
+        for wires in ([1], [2, 0], [0, 1, 2], [1, 2, 0]):
+            tape = QuantumScript(ops, [qml.probs(wires=wires)])
+            self.assertTrue(
+                np.allclose(
+                    self.dev_pennylane.execute(tape), self.dev_snowflurry.execute(tape)
+                ),
+                f"Probabilities error for wires {wires}",
+            )
+
+
 if __name__ == "__main__":
 
     unittest.main()
@@ -1,10 +1,6 @@
 import unittest
 from pennylane_snowflurry.snowflurry_device import SnowflurryQubitDevice
-from juliacall import newmodule
-
-# TODO : this namespace should be imported from the plugin
-Snowflurry = newmodule("Snowflurry")
-Snowflurry.seval("using Snowflurry")
+from pennylane_snowflurry.pennylane_converter import Snowflurry
 
 
 class TestSnowflurryQubitDeviceInitialization(unittest.TestCase):